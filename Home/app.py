@@ -8,13 +8,22 @@ Pro Wind Energy Dashboard with Map Picker
 """
 
 import streamlit as st
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 import plotly.express as px
 import plotly.graph_objects as go
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional, fall back to the NumPy power model
+    njit = None
+
 # -------------------------
 # Page config
 # -------------------------
@@ -35,10 +44,32 @@ def toggle_dark_mode():
 
 st.sidebar.button("🌙 Toggle Dark/Light Mode", on_click=toggle_dark_mode)
 
-if st.session_state.dark_mode:
-    st.markdown("<style>body {background-color:#121212;color:white;} .stButton button {background-color:#1f77b4;color:white;}</style>", unsafe_allow_html=True)
-else:
-    st.markdown("<style>body {background-color:#f0f4f8;color:black;}</style>", unsafe_allow_html=True)
+@st.cache_resource
+def _theme_css(dark: bool) -> str:
+    if dark:
+        bg_color, text_color = "#121212", "white"  # dark mode
+        button_css = ".stButton button {background-color:#1f77b4;color:white;}"
+    else:
+        bg_color, text_color = "#e6f0f3", "black"  # light professional blueish tone
+        button_css = ""
+    return f"""
+<style>
+/* Body background */
+body {{
+    background-color: {bg_color};
+    color: {text_color};
+}}
+{button_css}
+/* Streamlit container transparency removed */
+.stContainer {{
+    background-color: rgba(255,255,255,0.9);
+    padding: 15px;
+    border-radius: 10px;
+}}
+</style>
+"""
+
+st.markdown(_theme_css(st.session_state.dark_mode), unsafe_allow_html=True)
 
 # -------------------------
 # Helper functions
@@ -46,14 +77,27 @@ else:
 GEOCODE_URL = "https://geocoding-api.open-meteo.com/v1/search"
 FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
 
+# One session per server process (cache_resource survives reruns), so pooled TLS
+# connections to the Open-Meteo hosts are reused from one Run click to the next
+@st.cache_resource(show_spinner=False)
+def _get_session():
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4,
+                                          max_retries=Retry(total=2, backoff_factor=0.3)))
+    session.headers.update({"Accept-Encoding": "gzip"})
+    return session
+
+@st.cache_data(ttl=86400, show_spinner=False)
 def geocode(place):
     params = {"name": place, "count": 5}
-    r = requests.get(GEOCODE_URL, params=params, timeout=15)
+    r = _get_session().get(GEOCODE_URL, params=params, timeout=15)
     r.raise_for_status()
-    data = r.json()
+    data = orjson.loads(r.content)
     return data.get("results", [])
 
-def fetch_wind_data(lat, lon, start_date, end_date):
+# Runs in worker threads without a ScriptRunContext, so the caller shows the spinner
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch_wind_data(lat, lon, start_date, end_date):
     params = {
         "latitude": lat,
         "longitude": lon,
@@ -62,26 +106,107 @@ def fetch_wind_data(lat, lon, start_date, end_date):
         "end_date": end_date.strftime("%Y-%m-%d"),
         "timezone": "UTC",
     }
-    r = requests.get(FORECAST_URL, params=params, timeout=20)
+    r = _get_session().get(FORECAST_URL, params=params, timeout=20)
     r.raise_for_status()
-    hourly = r.json().get("hourly", {})
+    hourly = orjson.loads(r.content).get("hourly", {})
     times = hourly.get("time", [])
     ws = hourly.get("windspeed_10m", [])
     if not times:
         return pd.DataFrame()
-    return pd.DataFrame({"time_utc": pd.to_datetime(times, utc=True), "wind_m_s": ws})
+    # One-decimal wind speeds fit comfortably in float32, halving memory for every later pass
+    ws = np.asarray(ws, dtype=np.float32)
+    # Open-Meteo always returns "YYYY-MM-DDTHH:MM", an explicit format skips inference
+    time_utc = pd.to_datetime(times, utc=True, format="%Y-%m-%dT%H:%M", cache=True)
+    return pd.DataFrame({
+        "time_utc": time_utc,
+        "time_epoch": time_utc.as_unit("s").astype("int64"),
+        "wind_m_s": ws,
+    })
 
-def adjust_height(wind_series, z_from=10.0, z_to=80.0, alpha=0.14):
+def fetch_wind_data(lat, lon, start_date, end_date):
+    # Round so near-identical coordinates share one cache entry
+    return _fetch_wind_data(round(lat, 3), round(lon, 3), start_date, end_date)
+
+def adjust_height(wind_arr, z_from=10.0, z_to=80.0, alpha=0.14, inplace=False):
     factor = (z_to / z_from) ** alpha
-    return wind_series * factor
+    wind_arr = np.asarray(wind_arr)
+    if inplace:
+        # Caller owns the buffer: scale it without allocating a new array
+        wind_arr *= factor
+        return wind_arr
+    return wind_arr * factor
+
+# Compiled once per server process; a module-level @njit would build a new
+# Dispatcher on every rerun. Fast-math flags exclude "nnan" so NaN input is well defined.
+@st.cache_resource
+def _get_power_kernel():
+    @njit(fastmath={"contract", "arcp", "reassoc"})
+    def _turbine_power_kernel(v, A_cp_rho_half, rated_w, cut_in, cut_out):
+        out = np.empty_like(v)
+        for i in range(v.shape[0]):
+            vi = v[i]
+            if np.isnan(vi):
+                p = np.nan
+            elif vi >= cut_in and vi <= cut_out:
+                p = A_cp_rho_half * vi * vi * vi
+                if p > rated_w:
+                    p = rated_w
+            else:
+                p = 0.0
+            out[i] = p * 1e-3
+        return out
+    return _turbine_power_kernel
 
 def turbine_power_from_wind(v, rotor_diameter, cp=0.4, air_density=1.225, rated_power_kw=1500,
                            cut_in=3.5, cut_out=25.0, rated_wind=12.0):
+    v = np.asarray(v, dtype=np.float32)
     A = np.pi * (rotor_diameter / 2.0) ** 2
-    P_watt = 0.5 * air_density * A * cp * (v ** 3)
-    P_watt = np.where((v < cut_in) | (v > cut_out), 0.0, P_watt)
-    P_watt = np.minimum(P_watt, rated_power_kw * 1000.0)
-    return P_watt / 1000.0
+    if njit is not None:
+        return _get_power_kernel()(np.ascontiguousarray(v).ravel(), 0.5 * air_density * A * cp,
+                                   rated_power_kw * 1000.0, cut_in, cut_out).reshape(v.shape)
+    mask = (v >= cut_in) & (v <= cut_out)
+    # Single output buffer, updated in place: v^3 inside the operating window, 0 outside
+    P_watt = np.zeros_like(v)
+    np.power(v, 3, out=P_watt, where=mask)
+    P_watt *= 0.5 * air_density * A * cp
+    np.minimum(P_watt, rated_power_kw * 1000.0, out=P_watt)
+    # Missing wind hours stay missing instead of counting as zero output
+    P_watt[np.isnan(v)] = np.nan
+    return P_watt * 1e-3
+
+def _hash_df(d):
+    # Content plus schema, so frames with the same values but different columns/dtypes differ
+    return (tuple(d.columns), tuple(map(str, d.dtypes)),
+            pd.util.hash_pandas_object(d, index=False).values.tobytes())
+
+# Figures are held by reference (cache_resource): a cache_data hit would unpickle and
+# re-validate the whole figure, costing about as much as building it
+_DF_HASH_FUNCS = {pd.DataFrame: _hash_df}
+
+@st.cache_resource(hash_funcs=_DF_HASH_FUNCS, max_entries=8, show_spinner=False)
+def _build_wind_fig(df: pd.DataFrame) -> go.Figure:
+    return px.line(df, x="time_utc", y="wind_hub_m_s", color="source", labels={"wind_hub_m_s":"Wind @ hub (m/s)","time_utc":"Time"}, title="Wind speed (hub height)")
+
+@st.cache_resource(hash_funcs=_DF_HASH_FUNCS, max_entries=8, show_spinner=False)
+def _build_power_fig(df: pd.DataFrame, rated_power_kw: float) -> go.Figure:
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=df["time_utc"], y=df["power_kW"], mode='lines', name='Power (kW)', line=dict(color='#ff7f0e')))
+    # A horizontal line only needs its two end points
+    x_ends = [df["time_utc"].iloc[0], df["time_utc"].iloc[-1]]
+    fig.add_trace(go.Scatter(x=x_ends, y=[rated_power_kw, rated_power_kw], mode='lines', name='Rated Power', line=dict(color='red', dash='dash')))
+    fig.update_layout(title="Turbine Power", xaxis_title="Time", yaxis_title="Power (kW)")
+    return fig
+
+@st.cache_resource(hash_funcs=_DF_HASH_FUNCS, max_entries=8, show_spinner=False)
+def _build_48_fig(display_df: pd.DataFrame) -> go.Figure:
+    fig = go.Figure(go.Scattergl(x=display_df["time_display"].to_numpy(), y=display_df["power_kW"].to_numpy(), mode='lines', name='Power (kW)'))
+    fig.update_layout(title="Next 48h Power Forecast", xaxis_title="Time", yaxis_title="Power (kW)")
+    return fig
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _df_to_csv(df: pd.DataFrame) -> bytes:
+    # time_epoch is an internal index column; keep the exported CSV format unchanged
+    return df.drop(columns="time_epoch", errors="ignore").to_csv(index=False).encode("utf-8")
 
 # -------------------------
 # Sidebar turbine settings
@@ -132,9 +257,16 @@ if run_fetch:
                 lon = chosen["longitude"]
                 st.markdown(f"**Location:** {chosen.get('name')}, {chosen.get('country','')} — lat {lat:.4f}, lon {lon:.4f}")
 
-        today_utc = datetime.utcnow().date()
-        hist_df = fetch_wind_data(lat, lon, today_utc - timedelta(days=history_days), today_utc - timedelta(days=1))
-        fc_df = fetch_wind_data(lat, lon, today_utc, today_utc + timedelta(days=forecast_days))
+        now_utc = pd.Timestamp.now(tz="UTC")
+        today_utc = now_utc.date()
+        hist_range = (today_utc - timedelta(days=history_days), today_utc - timedelta(days=1))
+        fc_range = (today_utc, today_utc + timedelta(days=forecast_days))
+        # History and forecast are independent requests, fetch them concurrently
+        with st.spinner("Fetching wind data..."), ThreadPoolExecutor(max_workers=2) as ex:
+            hist_future = ex.submit(fetch_wind_data, lat, lon, *hist_range)
+            fc_future = ex.submit(fetch_wind_data, lat, lon, *fc_range)
+            hist_df = hist_future.result()
+            fc_df = fc_future.result()
 
         if hist_df.empty and fc_df.empty:
             st.error("No wind data returned.")
@@ -142,13 +274,21 @@ if run_fetch:
             if not hist_df.empty: hist_df["source"]="history"
             if not fc_df.empty: fc_df["source"]="forecast"
 
-            df = pd.concat([hist_df, fc_df], ignore_index=True).sort_values("time_utc").reset_index(drop=True)
-            df["wind_hub_m_s"] = adjust_height(df["wind_m_s"], 10.0, hub_height, alpha)
-            df["power_kW"] = turbine_power_from_wind(df["wind_hub_m_s"], rotor_diameter, cp, rated_power_kw=rated_power_kw)
-            df["energy_kWh"] = df["power_kW"]
+            df = pd.concat([hist_df, fc_df], ignore_index=True)
+            # History normally ends before the forecast starts, so the concat is already sorted
+            if not (hist_df.empty or fc_df.empty) and hist_df["time_epoch"].iloc[-1] >= fc_df["time_epoch"].iloc[0]:
+                df = df.sort_values("time_epoch", kind="mergesort", ignore_index=True)
+            df["source"] = pd.Categorical(df["source"], categories=["history", "forecast"])
+            # Run the physics on plain ndarrays, skipping pandas' per-op overhead
+            hub_np = df["wind_m_s"].to_numpy(dtype=np.float32, copy=True)
+            adjust_height(hub_np, 10.0, hub_height, alpha, inplace=True)
+            power_np = turbine_power_from_wind(hub_np, rotor_diameter, cp, rated_power_kw=rated_power_kw)
+            df["wind_hub_m_s"] = hub_np
+            df["power_kW"] = power_np
 
             # Gradient metrics cards
-            total_energy_next7 = df[df["source"]=="forecast"]["energy_kWh"].sum()
+            # Hourly samples: mean kW over each hour equals the kWh produced in it
+            total_energy_next7 = df.loc[df["source"]=="forecast", "power_kW"].sum()
             avg_cf = df["power_kW"].mean()/rated_power_kw if rated_power_kw>0 else 0.0
             col_a, col_b, col_c = st.columns(3)
             col_a.markdown(f"<div style='background:linear-gradient(135deg,#1f77b4,#0d3b66);padding:15px;border-radius:10px;color:white;text-align:center;font-size:18px;'>⚡ Energy (next 7d)<br><b>{total_energy_next7:.1f} kWh</b></div>", unsafe_allow_html=True)
@@ -156,30 +296,35 @@ if run_fetch:
             col_c.markdown(f"<div style='background:linear-gradient(135deg,#2ca02c,#145214);padding:15px;border-radius:10px;color:white;text-align:center;font-size:18px;'>🌬 Avg Wind @ Hub<br><b>{df['wind_hub_m_s'].mean():.1f} m/s</b></div>", unsafe_allow_html=True)
 
             # Plots
-            fig_wind = px.line(df, x="time_utc", y="wind_hub_m_s", color="source", labels={"wind_hub_m_s":"Wind @ hub (m/s)","time_utc":"Time"}, title="Wind speed (hub height)")
+            fig_wind = _build_wind_fig(df)
             st.plotly_chart(fig_wind, use_container_width=True)
 
-            fig_power = go.Figure()
-            fig_power.add_trace(go.Scatter(x=df["time_utc"], y=df["power_kW"], mode='lines', name='Power (kW)', line=dict(color='#ff7f0e')))
-            fig_power.add_trace(go.Scatter(x=df["time_utc"], y=[rated_power_kw]*len(df), mode='lines', name='Rated Power', line=dict(color='red', dash='dash')))
-            fig_power.update_layout(title="Turbine Power", xaxis_title="Time", yaxis_title="Power (kW)")
+            fig_power = _build_power_fig(df, rated_power_kw)
             st.plotly_chart(fig_power, use_container_width=True)
 
             # Next 48h
             st.subheader("Next 48 hours forecast")
-            now_utc = pd.Timestamp.now(tz="UTC")
-            next48 = df[(df["time_utc"]>=now_utc)&(df["time_utc"]<=now_utc+pd.Timedelta(hours=48))]
+            # time_epoch is sorted, so the 48h window is a contiguous slice
+            epoch_arr = df["time_epoch"].to_numpy()
+            now_s = now_utc.timestamp()
+            lo = np.searchsorted(epoch_arr, now_s, side="left")
+            hi = np.searchsorted(epoch_arr, now_s + 48 * 3600, side="right")
+            next48 = df.iloc[lo:hi]
             if not next48.empty:
                 display_df = next48.copy()
-                display_df["time_display"] = display_df["time_utc"].dt.tz_convert("Asia/Kolkata")
-                st.dataframe(display_df[["time_display","wind_m_s","wind_hub_m_s","power_kW","energy_kWh","source"]].rename(columns={
-                    "time_display":"Time","wind_m_s":"wind@10m","wind_hub_m_s":"wind@hub","power_kW":"power_kW"
-                }))
-                fig_48 = px.line(display_df, x="time_display", y="power_kW", labels={"power_kW":"Power (kW)","time_display":"Time"}, title="Next 48h Power Forecast")
+                display_df["time_display"] = pd.to_datetime(display_df["time_epoch"], unit="s", utc=True).dt.tz_convert("Asia/Kolkata")
+                # Display precision only: the table shows 2 decimals for wind, 1 for power
+                view = display_df[["time_display","wind_m_s","wind_hub_m_s","power_kW","source"]].round(
+                    {"wind_m_s":2,"wind_hub_m_s":2,"power_kW":1}
+                ).rename(columns={
+                    "time_display":"Time","wind_m_s":"wind@10m","wind_hub_m_s":"wind@hub","power_kW":"power_kW / energy_kWh"
+                })
+                st.dataframe(view)
+                fig_48 = _build_48_fig(display_df)
                 st.plotly_chart(fig_48, use_container_width=True)
 
             # Download CSV
-            csv = df.to_csv(index=False)
+            csv = _df_to_csv(df)
             st.download_button("💾 Download full hourly data CSV", csv, file_name="wind_hourly_estimates.csv", mime="text/csv")
 
     except Exception as e:
@@ -193,27 +338,3 @@ st.markdown("""
 - Local terrain, wakes, and turbulence affect production.
 - For commercial decisions, use on-site measurements or validated reanalysis.
 """)
-# -------------------------
-# Custom background color
-# -------------------------
-if st.session_state.dark_mode:
-    bg_color = "#121212"  # dark mode
-else:
-    bg_color = "#e6f0f3"  # light professional blueish tone
-
-st.markdown(f"""
-<style>
-/* Body background */
-body {{
-    background-color: {bg_color};
-}}
-/* Streamlit container transparency removed */
-.stContainer {{
-    background-color: rgba(255,255,255,0.9);
-    padding: 15px;
-    border-radius: 10px;
-}}
-</style>
-""", unsafe_allow_html=True)
-
-